@@ -32,17 +32,17 @@ import argparse
 import codecs
 import os
 import re
-import subprocess
+import stat
 import sys
 from collections import Counter
 from enum import Enum, auto
-from functools import partial
+from functools import lru_cache, partial
 from importlib import metadata as importlib_metadata
 from importlib.metadata import Distribution
 from pathlib import Path
+from types import MappingProxyType
 from typing import TYPE_CHECKING, Iterable, List, Type, cast
 
-import tomli
 from prettytable import ALL as RULE_ALL
 from prettytable import HEADER as RULE_HEADER
 from prettytable import NONE as RULE_NONE
@@ -50,11 +50,23 @@ from prettytable import PrettyTable
 
 if TYPE_CHECKING:
     from email.message import Message
-    from typing import Callable, Dict, Iterator, Optional, Sequence
+    from typing import (
+        Any,
+        Callable,
+        Dict,
+        Iterator,
+        Mapping,
+        Optional,
+        Sequence,
+        Tuple,
+    )
 
 
 open = open  # noqa:A001 allow monkey patching
 
+# Only defined on Windows, where files are opened in text mode otherwise
+O_BINARY = getattr(os, "O_BINARY", 0)
+
 __pkgname__ = "pip-license-audit"
 __version__ = "0.0.1"
 __summary__ = (
@@ -95,6 +107,15 @@ SUMMARY_OUTPUT_FIELDS = (
 )
 
 
+# Keys of the `Project-URL` metadata used as homepage, by priority
+PROJECT_URL_PRIORITY = {
+    key: rank
+    for rank, key in enumerate(
+        ("homepage", "source", "repository", "changelog", "bug tracker")
+    )
+}
+
+
 def extract_homepage(metadata: Message) -> Optional[str]:
     """Extracts the homepage attribute from the package metadata.
 
@@ -113,28 +134,29 @@ def extract_homepage(metadata: Message) -> Optional[str]:
     if homepage is not None:
         return homepage
 
-    candidates: Dict[str, str] = {}
-
-    for entry in metadata.get_all("Project-URL", []):
-        key, value = entry.split(",", 1)
-        candidates[key.strip().lower()] = value.strip()
+    homepage_rank = len(PROJECT_URL_PRIORITY)
 
-    for priority_key in [
-        "homepage",
-        "source",
-        "repository",
-        "changelog",
-        "bug tracker",
-    ]:
-        if priority_key in candidates:
-            return candidates[priority_key]
+    for entry in metadata.get_all("Project-URL") or ():
+        key, _, value = entry.partition(",")
+        rank = PROJECT_URL_PRIORITY.get(key.strip().lower())
+        if rank is None or rank >= homepage_rank:
+            # Among entries of the same priority the first one wins
+            continue
+        if rank == 0:
+            # Nothing can take precedence over `homepage`
+            return value.strip()
+        homepage_rank = rank
+        homepage = value.strip()
 
-    return None
+    return homepage
 
 
 PATTERN_DELIMITER = re.compile(r"[-_.]+")
+PATTERN_LICENSE_FILE = re.compile(r"LICEN[CS]E.*|COPYING.*")
+PATTERN_NOTICE_FILE = re.compile(r"NOTICE.*")
 
 
+@lru_cache(maxsize=4096)
 def normalize_pkg_name(pkg_name: str) -> str:
     """Return normalized name according to PEP specification
 
@@ -150,23 +172,15 @@ def normalize_pkg_name(pkg_name: str) -> str:
     return PATTERN_DELIMITER.sub("-", pkg_name).lower()
 
 
-METADATA_KEYS: Dict[str, List[Callable[[Message], Optional[str]]]] = {
-    "home-page": [extract_homepage],
-    "author": [
-        lambda metadata: metadata.get("author"),
-        lambda metadata: metadata.get("author-email"),
-    ],
-    "maintainer": [
-        lambda metadata: metadata.get("maintainer"),
-        lambda metadata: metadata.get("maintainer-email"),
-    ],
+# Metadata keys of each field, the first non-empty value is used. The
+# `home-page` field is extracted by `extract_homepage`.
+METADATA_KEYS: Dict[str, Tuple[str, ...]] = {
+    "author": ("author", "author-email"),
+    "maintainer": ("maintainer", "maintainer-email"),
     # PyPI doesn't let you set both license and license-expression, they're
     # equivalent so just collapsing them into one.
-    "license": [
-        lambda metadata: metadata.get("license-expression")
-        or metadata.get("license")
-    ],
-    "summary": [lambda metadata: metadata.get("summary")],
+    "license": ("license-expression", "license"),
+    "summary": ("summary",),
 }
 
 # Mapping of FIELD_NAMES to METADATA_KEYS where they differ by more than case
@@ -179,95 +193,408 @@ FIELDS_TO_METADATA_KEYS = {
 }
 
 
-SYSTEM_PACKAGES = (
-    __pkgname__,
-    "pip",
-    "prettytable",
-    "wcwidth",
-    "setuptools",
-    "tomli",
-    "wheel",
+SYSTEM_PACKAGES = frozenset(
+    normalize_pkg_name(pkg_name)
+    for pkg_name in (
+        __pkgname__,
+        "pip",
+        "prettytable",
+        "wcwidth",
+        "setuptools",
+        "tomli",
+        "wheel",
+    )
 )
 
 LICENSE_UNKNOWN = "UNKNOWN"
 
+# Appended to the contents of an included (license/notice) file truncated
+# with --max-license-length
+TRUNCATED_MARKER = "\n...[truncated]"
 
-def get_packages(
-    args: CustomNamespace,
-) -> Iterator[dict[str, str | list[str]]]:
-    def get_pkg_included_file(
-        pkg: Distribution, file_names_rgx: str
-    ) -> tuple[str, str]:
-        """
-        Attempt to find the package's included file on disk and return the
-        tuple (included_file_path, included_file_contents).
-        """
-        included_file = LICENSE_UNKNOWN
-        included_text = LICENSE_UNKNOWN
-
-        pkg_files = pkg.files or ()
-        pattern = re.compile(file_names_rgx)
-        matched_rel_paths = filter(
-            lambda file: pattern.match(file.name), pkg_files
+
+def get_pkg_metadata_dir(pkg: Distribution) -> Optional[Path]:
+    """
+    Return the path of the package's metadata directory (or .egg-info file)
+    on disk, None if it isn't known or not on the file system (e.g. zipped).
+    """
+    # `_path` is only set by `PathDistribution` and is not part of the API
+    metadata_dir = getattr(pkg, "_path", None)
+    return metadata_dir if isinstance(metadata_dir, Path) else None
+
+
+def find_files_in_metadata_dir(
+    pkg: Distribution, pattern: re.Pattern[str]
+) -> list[Path]:
+    """
+    Find the files matching the pattern directly in the package's metadata
+    directory, for distributions which don't list their files (no RECORD).
+    """
+    metadata_dir = get_pkg_metadata_dir(pkg)
+    if metadata_dir is None or not metadata_dir.is_dir():
+        return []
+    with os.scandir(metadata_dir) as entries:
+        return sorted(
+            Path(entry.path)
+            for entry in entries
+            if pattern.match(entry.name) and entry.is_file()
+        )
+
+
+def get_pkg_included_file(
+    pkg: Distribution,
+    pattern: re.Pattern[str],
+    max_length: int = 0,
+) -> tuple[str, str]:
+    """
+    Attempt to find the package's included file on disk and return the
+    tuple (included_file_path, included_file_contents).
+
+    If max_length is set, contents longer than max_length characters are
+    truncated and end with TRUNCATED_MARKER.
+    """
+    included_file = LICENSE_UNKNOWN
+    included_text = LICENSE_UNKNOWN
+
+    pkg_files = pkg.files
+    matched_paths: Iterable[Path]
+    if pkg_files is None:
+        matched_paths = find_files_in_metadata_dir(pkg, pattern)
+    else:
+        matched_paths = (
+            Path(pkg.locate_file(rel_path))  # type: ignore[arg-type]
+            for rel_path in pkg_files
+            if pattern.match(rel_path.name)
         )
-        for rel_path in matched_rel_paths:
-            abs_path = Path(pkg.locate_file(rel_path)) # type: ignore[arg-type]
-            if not abs_path.is_file():
-                continue
-            included_file = str(abs_path)
-            with open(
-                abs_path, encoding="utf-8", errors="backslashreplace"
-            ) as included_file_handle:
+    abs_path = next((path for path in matched_paths if path.is_file()), None)
+    if abs_path is not None:
+        included_file = str(abs_path)
+        with open(
+            abs_path, encoding="utf-8", errors="backslashreplace"
+        ) as included_file_handle:
+            if max_length > 0:
+                included_text = included_file_handle.read(max_length)
+                if included_file_handle.read(1):
+                    included_text += TRUNCATED_MARKER
+            else:
                 included_text = included_file_handle.read()
-            break
-        return (included_file, included_text)
+    return (included_file, included_text)
 
-    def get_pkg_info(pkg: Distribution) -> dict[str, str | list[str]]:
-        (license_file, license_text) = get_pkg_included_file(
-            pkg, "LICEN[CS]E.*|COPYING.*"
+
+PATTERN_NOT_LATIN1 = re.compile(r"[^\x00-\xff]+")
+
+
+@lru_cache(maxsize=None)
+def create_string_filter(code_page: str) -> Callable[[str], str]:
+    """
+    Create function dropping the characters which can't be encoded with
+    the code page
+    """
+    codec = codecs.lookup(code_page)
+    if codec.name == "iso8859-1":
+        # Latin-1 maps exactly the first 256 code points
+        return partial(PATTERN_NOT_LATIN1.sub, "")
+
+    def filter_string(item: str) -> str:
+        return codec.decode(codec.encode(item, "ignore")[0])[0]
+
+    return filter_string
+
+
+def get_pkg_info(
+    pkg: Distribution, args: CustomNamespace
+) -> dict[str, str | list[str]]:
+    (license_file, license_text) = get_pkg_included_file(
+        pkg, PATTERN_LICENSE_FILE, args.max_license_length
+    )
+    (notice_file, notice_text) = get_pkg_included_file(
+        pkg, PATTERN_NOTICE_FILE, args.max_license_length
+    )
+    # Type hint of `Distribution.metadata` states `PackageMetadata`
+    # but it's actually of type `email.Message`
+    metadata = cast("Message", pkg.metadata)
+    pkg_info: dict[str, str | list[str]] = {
+        "name": metadata["name"],
+        "version": pkg.version,
+        "namever": "{} {}".format(metadata["name"], pkg.version),
+        "licensefile": license_file,
+        "licensetext": license_text,
+        "noticefile": notice_file,
+        "noticetext": notice_text,
+    }
+    for field_name, metadata_keys in METADATA_KEYS.items():
+        value = None
+        for metadata_key in metadata_keys:
+            value = metadata.get(metadata_key)
+            if value:
+                break
+        pkg_info[field_name] = value or LICENSE_UNKNOWN
+    pkg_info["home-page"] = extract_homepage(metadata) or LICENSE_UNKNOWN
+
+    classifiers: list[str] = metadata.get_all("classifier", [])
+    pkg_info["license_classifier"] = find_license_from_classifier(classifiers)
+
+    if args.filter_strings:
+        filter_string = create_string_filter(args.filter_code_page)
+        for k in pkg_info:
+            if isinstance(pkg_info[k], list):
+                pkg_info[k] = list(map(filter_string, pkg_info[k]))
+            else:
+                pkg_info[k] = filter_string(cast(str, pkg_info[k]))
+
+    # Licenses according to --from, shared by the license checks and tables
+    license_set = select_license_by_source(
+        args.from_,
+        cast(List[str], pkg_info["license_classifier"]),
+        cast(str, pkg_info["license"]),
+    )
+    # Most packages have a single license, no need to sort and join then
+    if len(license_set) > 1:
+        license_names = sorted(license_set)
+        pkg_info["license_names_str"] = "; ".join(license_names)
+    else:
+        license_names = list(license_set)
+        pkg_info["license_names_str"] = next(
+            iter(license_set), LICENSE_UNKNOWN
         )
-        (notice_file, notice_text) = get_pkg_included_file(pkg, "NOTICE.*")
-        pkg_info: dict[str, str | list[str]] = {
-            "name": pkg.metadata["name"],
-            "version": pkg.version,
-            "namever": "{} {}".format(pkg.metadata["name"], pkg.version),
-            "licensefile": license_file,
-            "licensetext": license_text,
-            "noticefile": notice_file,
-            "noticetext": notice_text,
-        }
-        metadata = pkg.metadata
-        for field_name, field_selector_fns in METADATA_KEYS.items():
-            value = None
-            for field_selector_fn in field_selector_fns:
-                # Type hint of `Distribution.metadata` states `PackageMetadata`
-                # but it's actually of type `email.Message`
-                value = field_selector_fn(metadata) # type: ignore[arg-type]
-                if value:
-                    break
-            pkg_info[field_name] = value or LICENSE_UNKNOWN
-
-        classifiers: list[str] = metadata.get_all("classifier", [])
-        pkg_info["license_classifier"] = find_license_from_classifier(
-            classifiers
+    pkg_info["license_names"] = license_names
+
+    return pkg_info
+
+
+def get_venv_sys_path(executable: str) -> Optional[list[str]]:
+    """
+    Compute where to search distributions of a virtual environment from its
+    pyvenv.cfg, without starting its python executable.
+
+    None is returned when the environment isn't a plain virtual environment,
+    e.g. one including the system site-packages.
+    """
+    executable_path = Path(executable)
+    if not executable_path.is_file():
+        return None
+    venv_dir = executable_path.parent.parent
+    try:
+        with open(venv_dir / "pyvenv.cfg", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+
+    config: Dict[str, str] = {}
+    for line in lines:
+        key, sep, value = line.partition("=")
+        if sep:
+            config[key.strip().lower()] = value.strip()
+
+    if config.get("include-system-site-packages", "").lower() != "false":
+        return None
+    # `version` is written by venv and `version_info` by virtualenv
+    version = config.get("version") or config.get("version_info") or ""
+    major, _, minor = version.partition(".")
+    minor = minor.partition(".")[0]
+    if not (major.isdigit() and minor.isdigit()):
+        return None
+
+    if os.name == "nt":
+        site_packages = venv_dir / "Lib" / "site-packages"
+    else:
+        site_packages = (
+            venv_dir / "lib" / f"python{major}.{minor}" / "site-packages"
         )
+    if not site_packages.is_dir():
+        return None
+
+    search_paths = [str(site_packages)]
+    # Directories added by path configuration files, e.g. editable installs
+    for pth_file in sorted(site_packages.glob("*.pth")):
+        with open(pth_file, encoding="utf-8", errors="replace") as f:
+            for pth_line in f.read().splitlines():
+                pth_line = pth_line.strip()
+                if not pth_line or pth_line.startswith(
+                    ("#", "import ", "import\t")
+                ):
+                    continue
+                pth_dir = site_packages / pth_line
+                if pth_dir.is_dir():
+                    search_paths.append(str(pth_dir))
+    return search_paths
+
+
+# Upper bound of worker threads used to read the package metadata and the
+# license/notice files, which is dominated by file I/O
+MAX_WORKERS = 32
+
+
+def get_pkg_name(pkg: Distribution) -> str:
+    """
+    Return the package name, taken from the name of its metadata directory
+    when possible so that the metadata doesn't need to be read and parsed
+    """
+    metadata_dir = get_pkg_metadata_dir(pkg)
+    if metadata_dir is not None and metadata_dir.suffix in (
+        ".dist-info",
+        ".egg-info",
+    ):
+        # `{name}-{version}.dist-info`, where `-` is escaped in the name
+        pkg_name = metadata_dir.stem.partition("-")[0]
+        if pkg_name:
+            return pkg_name
+    return pkg.metadata["name"]
 
-        if args.filter_strings:
 
-            def filter_string(item: str) -> str:
-                return item.encode(
-                    args.filter_code_page, errors="ignore"
-                ).decode(args.filter_code_page)
+def read_pkg_infos(
+    args: CustomNamespace, search_paths: list[str]
+) -> list[dict[str, str | list[str]]]:
+    pkgs = importlib_metadata.distributions(path=search_paths)
+    ignore_pkgs_as_normalize = set()
+    ignore_pkg_versions: Dict[str, set[str]] = {}
+    for ignore_pkg in args.ignore_packages:
+        ignore_name, sep, ignore_version = ignore_pkg.partition(":")
+        if sep:
+            ignore_pkg_versions.setdefault(
+                normalize_pkg_name(ignore_name), set()
+            ).add(ignore_version.lower())
+        else:
+            ignore_pkgs_as_normalize.add(normalize_pkg_name(ignore_name))
+    pkgs_as_normalize = {normalize_pkg_name(pkg) for pkg in args.packages}
+
+    # Filter by name first, so that only the metadata of the selected
+    # packages is read
+    selected_pkgs = []
+    for pkg in pkgs:
+        pkg_name = normalize_pkg_name(get_pkg_name(pkg))
+
+        if pkg_name in ignore_pkgs_as_normalize:
+            continue
+
+        if pkgs_as_normalize and pkg_name not in pkgs_as_normalize:
+            continue
+
+        if not args.with_system and pkg_name in SYSTEM_PACKAGES:
+            continue
+
+        if (
+            pkg_name in ignore_pkg_versions
+            and pkg.version.lower() in ignore_pkg_versions[pkg_name]
+        ):
+            continue
+
+        selected_pkgs.append(pkg)
+
+    # import included here in order to limit startup time
+    # if the package information comes from the cache,
+    # then the dependency is not required
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Reading the metadata and the license files is I/O bound, so fan it out
+    # to threads. The license checks are left to the caller so that
+    # `sys.exit` is raised in the calling thread.
+    with ThreadPoolExecutor(
+        max_workers=min(MAX_WORKERS, len(selected_pkgs)) or 1
+    ) as executor:
+        return list(
+            executor.map(partial(get_pkg_info, args=args), selected_pkgs)
+        )
+
+
+# Name of the files written by read_cached_pkg_infos, other files in the
+# cache directory are left alone
+PATTERN_CACHE_FILE = re.compile(r"[0-9a-f]{32}\.json")
+# Bump whenever the package information returned by get_pkg_info changes,
+# so that files written by another version are not read
+CACHE_FORMAT = 1
+# Number of cache files kept, the least recently used ones are removed
+MAX_CACHE_FILES = 16
+
+
+def read_cached_pkg_infos(
+    args: CustomNamespace, search_paths: list[str], cache_dir: str
+) -> list[dict[str, str | list[str]]]:
+    """
+    Same as read_pkg_infos(), cached as a file in the cache_dir.
+
+    The cache is keyed on the options changing the package information and on
+    the modification time of the search paths, which changes whenever a
+    package is installed, upgraded or uninstalled.
+    """
+    # import included here in order to limit dependencies
+    # if not interested in caching,
+    # then the dependency is not required
+    import hashlib
+    import json
+
+    key_parts = [
+        __version__,
+        str(CACHE_FORMAT),
+        args.from_.name,
+        " ".join(sorted(args.ignore_packages)),
+        " ".join(sorted(args.packages)),
+        str(args.with_system),
+        str(args.filter_strings),
+        args.filter_code_page,
+        str(args.max_license_length),
+    ]
+    for path in search_paths:
+        try:
+            key_parts.append("{}:{}".format(path, os.stat(path).st_mtime_ns))
+        except OSError:
+            key_parts.append(path)
+    cache_key = hashlib.blake2b(
+        "|".join(key_parts).encode("utf-8"), digest_size=16
+    ).hexdigest()
+    cache_file = Path(cache_dir) / "{}.json".format(cache_key)
+
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            cached_pkg_infos = json.load(f)
+    except (OSError, ValueError):
+        pass
+    else:
+        try:
+            # Mark the file as recently used, so that it is kept by pruning
+            os.utime(cache_file)
+        except OSError:
+            pass
+        return cached_pkg_infos
 
-            for k in pkg_info:
-                if isinstance(pkg_info[k], list):
-                    pkg_info[k] = list(map(filter_string, pkg_info[k]))
-                else:
-                    pkg_info[k] = filter_string(cast(str, pkg_info[k]))
+    pkg_infos = read_pkg_infos(args, search_paths)
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Replace the file at once, so that concurrent runs never read a
+        # partially written cache
+        write_output_file(
+            str(cache_file), json.dumps(pkg_infos).encode("utf-8")
+        )
+        # Keep the entries of other environments and options, up to a
+        # limit, as they are likely to be used again (e.g. tox envs)
+        cache_files = sorted(
+            (
+                path
+                for path in cache_file.parent.iterdir()
+                if PATTERN_CACHE_FILE.fullmatch(path.name)
+            ),
+            key=lambda path: path.stat().st_mtime_ns,
+            reverse=True,
+        )
+        for stale_file in cache_files[MAX_CACHE_FILES:]:
+            stale_file.unlink(missing_ok=True)
+    except OSError:
+        # The cache is only an optimization, don't fail without it
+        pass
+    return pkg_infos
 
-        return pkg_info
 
+def get_packages(
+    args: CustomNamespace,
+) -> Iterator[dict[str, str | list[str]]]:
     def get_python_sys_path(executable: str) -> list[str]:
+        venv_sys_path = get_venv_sys_path(executable)
+        if venv_sys_path is not None:
+            return venv_sys_path
+
+        # Only needed when searching another interpreter's environment
+        import subprocess
+
         script = "import sys; print(' '.join(filter(bool, sys.path)))"
         output = subprocess.run(
             [executable, "-c", script],
@@ -281,11 +608,10 @@ def get_packages(
     else:
         search_paths = get_python_sys_path(args.python)
 
-    pkgs = importlib_metadata.distributions(path=search_paths)
-    ignore_pkgs_as_normalize = [
-        normalize_pkg_name(pkg) for pkg in args.ignore_packages
-    ]
-    pkgs_as_normalize = [normalize_pkg_name(pkg) for pkg in args.packages]
+    if args.cache_dir:
+        pkg_infos = read_cached_pkg_infos(args, search_paths, args.cache_dir)
+    else:
+        pkg_infos = read_pkg_infos(args, search_paths)
 
     fail_on_licenses = set()
     if args.fail_on:
@@ -295,39 +621,26 @@ def get_packages(
     if args.allow_only:
         allow_only_licenses = set(map(str.strip, args.allow_only.split(";")))
 
-    for pkg in pkgs:
-        pkg_name = normalize_pkg_name(pkg.metadata["name"])
-        pkg_name_and_version = pkg_name + ":" + pkg.metadata["version"]
-
-        if (
-            pkg_name.lower() in ignore_pkgs_as_normalize
-            or pkg_name_and_version.lower() in ignore_pkgs_as_normalize
-        ):
-            continue
-
-        if pkgs_as_normalize and pkg_name.lower() not in pkgs_as_normalize:
-            continue
-
-        if not args.with_system and pkg_name in SYSTEM_PACKAGES:
-            continue
-
-        pkg_info = get_pkg_info(pkg)
+    # Prepare the license sets once, rather than once per package
+    if args.partial_match:
+        fail_on_pattern = compile_partial_match_pattern(fail_on_licenses)
+        allow_only_pattern = compile_partial_match_pattern(allow_only_licenses)
+    else:
+        fail_on_lower = {lic.lower() for lic in fail_on_licenses}
+        allow_only_lower = {lic.lower() for lic in allow_only_licenses}
 
-        license_names = select_license_by_source(
-            args.from_,
-            cast(List[str], pkg_info["license_classifier"]),
-            cast(str, pkg_info["license"]),
-        )
+    for pkg_info in pkg_infos:
+        license_names = pkg_info["license_names"]
 
         if fail_on_licenses:
             failed_licenses = set()
             if not args.partial_match:
                 failed_licenses = case_insensitive_set_intersect(
-                    license_names, fail_on_licenses
+                    license_names, fail_on_licenses, fail_on_lower
                 )
             else:
                 failed_licenses = case_insensitive_partial_match_set_intersect(
-                    license_names, fail_on_licenses
+                    license_names, fail_on_pattern
                 )
             if failed_licenses:
                 sys.stderr.write(
@@ -344,11 +657,11 @@ def get_packages(
             uncommon_licenses = set()
             if not args.partial_match:
                 uncommon_licenses = case_insensitive_set_diff(
-                    license_names, allow_only_licenses
+                    license_names, allow_only_licenses, allow_only_lower
                 )
             else:
                 uncommon_licenses = case_insensitive_partial_match_set_diff(
-                    license_names, allow_only_licenses
+                    license_names, allow_only_pattern
                 )
 
             if len(uncommon_licenses) == len(license_names):
@@ -365,89 +678,115 @@ def get_packages(
         yield pkg_info
 
 
-def create_licenses_table(
+def create_licenses_rows(
     args: CustomNamespace,
     output_fields: Iterable[str] = DEFAULT_OUTPUT_FIELDS,
-) -> PrettyTable:
-    table = factory_styled_table_with_args(args, output_fields)
+    pkgs: Optional[Iterable[dict[str, str | list[str]]]] = None,
+) -> list[list[str]]:
+    if pkgs is None:
+        pkgs = get_packages(args)
+
+    # Resolve the key of each field once, rather than for every package
+    field_keys = [
+        (
+            "license_names_str"
+            if field == "License"
+            else FIELDS_TO_METADATA_KEYS.get(field, field.lower())
+        )
+        for field in output_fields
+    ]
 
-    for pkg in get_packages(args):
+    rows = []
+    for pkg in pkgs:
         row = []
-        for field in output_fields:
-            if field == "License":
-                license_set = select_license_by_source(
-                    args.from_,
-                    cast(List[str], pkg["license_classifier"]),
-                    cast(str, pkg["license"]),
-                )
-                license_str = "; ".join(sorted(license_set))
-                row.append(license_str)
-            elif field == "License-Classifier":
-                row.append(
-                    "; ".join(sorted(pkg["license_classifier"]))
-                    or LICENSE_UNKNOWN
-                )
-            elif field.lower() in pkg:
-                row.append(cast(str, pkg[field.lower()]))
+        for key in field_keys:
+            if key == "license_classifier":
+                row.append("; ".join(sorted(pkg[key])) or LICENSE_UNKNOWN)
             else:
-                row.append(cast(str, pkg[FIELDS_TO_METADATA_KEYS[field]]))
-        table.add_row(row)
+                row.append(cast(str, pkg[key]))
+        rows.append(row)
 
+    return rows
+
+
+def create_licenses_table(
+    args: CustomNamespace,
+    output_fields: Iterable[str] = DEFAULT_OUTPUT_FIELDS,
+    pkgs: Optional[Iterable[dict[str, str | list[str]]]] = None,
+) -> PrettyTable:
+    table = factory_styled_table_with_args(args, output_fields)
+    table.add_rows(create_licenses_rows(args, output_fields, pkgs))
     return table
 
 
-def create_summary_table(args: CustomNamespace) -> PrettyTable:
-    counts = Counter(
-        "; ".join(
-            sorted(
-                select_license_by_source(
-                    args.from_,
-                    cast(List[str], pkg["license_classifier"]),
-                    cast(str, pkg["license"]),
-                )
-            )
-        )
-        for pkg in get_packages(args)
-    )
+def create_summary_table(
+    args: CustomNamespace,
+    pkgs: Optional[Iterable[dict[str, str | list[str]]]] = None,
+) -> PrettyTable:
+    if pkgs is None:
+        pkgs = get_packages(args)
+
+    counts = Counter(cast(str, pkg["license_names_str"]) for pkg in pkgs)
 
     table = factory_styled_table_with_args(args, SUMMARY_FIELD_NAMES)
-    for lic, count in counts.items():
-        table.add_row([count, lic])
+    table.add_rows([[count, lic] for lic, count in counts.items()])
     return table
 
 
-def case_insensitive_set_intersect(set_a, set_b):
-    """Same as set.intersection() but case-insensitive"""
+def case_insensitive_set_intersect(set_a, set_b, set_b_lower=None):
+    """Same as set.intersection() but case-insensitive
+
+    set_b_lower can be given to reuse set_b already lowered by the caller
+    """
     common_items = set()
-    set_b_lower = {item.lower() for item in set_b}
+    if set_b_lower is None:
+        set_b_lower = {item.lower() for item in set_b}
     for elem in set_a:
         if elem.lower() in set_b_lower:
             common_items.add(elem)
     return common_items
 
 
+def compile_partial_match_pattern(
+    items: Iterable[str] | re.Pattern[str],
+) -> Optional[re.Pattern[str]]:
+    """Compile items into a single case-insensitive alternation pattern
+
+    A pattern given as-is is returned unchanged, so that callers can build it
+    once and reuse it for every package. None is returned for no items.
+    """
+    if isinstance(items, re.Pattern):
+        return items
+    escaped_items = [re.escape(item) for item in items]
+    if not escaped_items:
+        return None
+    return re.compile("|".join(escaped_items), re.IGNORECASE)
+
+
 def case_insensitive_partial_match_set_intersect(set_a, set_b):
-    common_items = set()
-    for item_a in set_a:
-        for item_b in set_b:
-            if item_b.lower() in item_a.lower():
-                common_items.add(item_a)
-    return common_items
+    """Items of set_a which contain any item of set_b, case-insensitive"""
+    pattern = compile_partial_match_pattern(set_b)
+    if pattern is None:
+        return set()
+    return {item_a for item_a in set_a if pattern.search(item_a)}
 
 
 def case_insensitive_partial_match_set_diff(set_a, set_b):
-    uncommon_items = set_a.copy()
-    for item_a in set_a:
-        for item_b in set_b:
-            if item_b.lower() in item_a.lower():
-                uncommon_items.remove(item_a)
-    return uncommon_items
+    """Items of set_a which contain no item of set_b, case-insensitive"""
+    pattern = compile_partial_match_pattern(set_b)
+    if pattern is None:
+        return set(set_a)
+    return {item_a for item_a in set_a if not pattern.search(item_a)}
+
 
+def case_insensitive_set_diff(set_a, set_b, set_b_lower=None):
+    """Same as set.difference() but case-insensitive
 
-def case_insensitive_set_diff(set_a, set_b):
-    """Same as set.difference() but case-insensitive"""
+    set_b_lower can be given to reuse set_b already lowered by the caller
+    """
     uncommon_items = set()
-    set_b_lower = {item.lower() for item in set_b}
+    if set_b_lower is None:
+        set_b_lower = {item.lower() for item in set_b}
     for elem in set_a:
         if elem.lower() not in set_b_lower:
             uncommon_items.add(elem)
@@ -517,36 +856,24 @@ class CSVPrettyTable(PrettyTable):
     """PrettyTable-like class exporting to CSV"""
 
     def get_string(self, **kwargs: str | list[str]) -> str:
-        def esc_quotes(val: bytes | str) -> str:
-            """
-            Meta-escaping double quotes
-            https://tools.ietf.org/html/rfc4180
-            """
-            try:
-                return cast(str, val).replace('"', '""')
-            except UnicodeDecodeError:  # pragma: no cover
-                return cast(bytes, val).decode("utf-8").replace('"', '""')
-            except UnicodeEncodeError:  # pragma: no cover
-                return str(
-                    cast(str, val).encode("unicode_escape").replace('"', '""')  # type: ignore[arg-type] # noqa: E501
-                )
+        # import included here in order to limit dependencies
+        # if not interested in CSV output,
+        # then the dependency is not required
+        import csv
+        import io
 
         options = self._get_options(kwargs)
         rows = self._get_rows(options)
         formatted_rows = self._format_rows(rows)
 
-        lines = []
-        formatted_header = ",".join(
-            ['"%s"' % (esc_quotes(val),) for val in self._field_names]
-        )
-        lines.append(formatted_header)
-        for row in formatted_rows:
-            formatted_row = ",".join(
-                ['"%s"' % (esc_quotes(val),) for val in row]
-            )
-            lines.append(formatted_row)
+        # Quoting and meta-escaping double quotes as of
+        # https://tools.ietf.org/html/rfc4180
+        output = io.StringIO()
+        writer = csv.writer(output, quoting=csv.QUOTE_ALL, lineterminator="\n")
+        writer.writerow(self._field_names)
+        writer.writerows(formatted_rows)
 
-        return "\n".join(lines)
+        return output.getvalue()[:-1]
 
 
 class PlainVerticalTable(PrettyTable):
@@ -606,15 +933,14 @@ def factory_styled_table_with_args(
 
 
 def find_license_from_classifier(classifiers: list[str]) -> list[str]:
-    licenses = []
-    for classifier in filter(lambda c: c.startswith("License"), classifiers):
-        lic = classifier.split(" :: ")[-1]
-
-        # Through the declaration of 'Classifier: License :: OSI Approved'
-        if lic != "OSI Approved":
-            licenses.append(lic)
+    licenses = (
+        classifier.rpartition(" :: ")[2]
+        for classifier in classifiers
+        if classifier.startswith("License")
+    )
 
-    return licenses
+    # Through the declaration of 'Classifier: License :: OSI Approved'
+    return [lic for lic in licenses if lic != "OSI Approved"]
 
 
 def select_license_by_source(
@@ -689,15 +1015,39 @@ def get_sortby(args: CustomNamespace) -> str:
     return "Name"
 
 
+def create_json_string(
+    rows: list[list[str]], output_fields: list[str], sortby: str
+) -> str:
+    """
+    Same output as JsonPrettyTable, without building the table first
+    """
+    # import included here in order to limit dependencies
+    # if not interested in JSON output,
+    # then the dependency is not required
+    import json
+
+    # Sort the same way as PrettyTable does
+    sortindex = output_fields.index(sortby)
+    rows = sorted(rows, key=lambda row: [row[sortindex]] + row)
+
+    lines = [dict(zip(output_fields, row)) for row in rows]
+    return json.dumps(lines, indent=2, sort_keys=True)
+
+
 def create_output_string(args: CustomNamespace) -> str:
     output_fields = get_output_fields(args)
+    sortby = get_sortby(args)
+    # Collect the packages once, whichever table is built from them
+    pkgs = list(get_packages(args))
+
+    if args.format_ == FormatArg.JSON and not args.summary:
+        rows = create_licenses_rows(args, output_fields, pkgs)
+        return create_json_string(rows, output_fields, sortby)
 
     if args.summary:
-        table = create_summary_table(args)
+        table = create_summary_table(args, pkgs)
     else:
-        table = create_licenses_table(args, output_fields)
-
-    sortby = get_sortby(args)
+        table = create_licenses_table(args, output_fields, pkgs)
 
     if args.format_ == FormatArg.HTML:
         html = table.get_html_string(fields=output_fields, sortby=sortby)
@@ -785,6 +1135,7 @@ class CustomNamespace(argparse.Namespace):
     format_: "FormatArg"
     summary: bool
     output_file: str
+    cache_dir: Optional[str]
     ignore_packages: List[str]
     packages: List[str]
     with_system: bool
@@ -794,6 +1145,7 @@ class CustomNamespace(argparse.Namespace):
     with_license_file: bool
     no_license_path: bool
     with_notice_file: bool
+    max_license_length: int
     filter_strings: bool
     filter_code_page: str
     partial_match: bool
@@ -819,6 +1171,13 @@ class CompatibleArgumentParser(argparse.ArgumentParser):
                 "'--no-license-path' and '--with-notice-file' require "
                 "the '--with-license-file' option to be set"
             )
+        if args.max_license_length < 0:
+            self.error("'--max-license-length' must not be negative")
+        if args.with_license_file is False and args.max_license_length:
+            self.error(
+                "'--max-license-length' requires "
+                "the '--with-license-file' option to be set"
+            )
         if args.filter_strings is False and args.filter_code_page != "latin1":
             self.error(
                 "'--filter-code-page' requires the '--filter-strings' "
@@ -907,11 +1266,288 @@ class SelectAction(argparse.Action):
         setattr(namespace, self.dest, get_value_from_enum(enum_cls, values))
 
 
-def load_config_from_file(pyproject_path: str):
-    if Path(pyproject_path).exists():
-        with open(pyproject_path, "rb") as f:
-            return tomli.load(f).get("tool", {}).get(__pkgname__, {})
-    return {}
+@lru_cache(maxsize=4)
+def read_config_file(
+    pyproject_path: str, file_id: Tuple[int, int, int]
+) -> Mapping[str, Any]:
+    """
+    Parse the configuration section of pyproject.toml
+
+    pyproject_path is expected to be absolute, and file_id to be the
+    modification time, size and inode of the file. Both are only part of
+    the cache key, so that another or a modified file is parsed again.
+    """
+    # import included here in order to skip it without pyproject.toml
+    import tomli
+
+    with open(pyproject_path, "rb") as f:
+        config = tomli.load(f).get("tool", {}).get(__pkgname__, {})
+    # The cached result is shared, so it must not be modified
+    return MappingProxyType(config)
+
+
+def load_config_from_file(pyproject_path: str) -> Mapping[str, Any]:
+    # The default path is relative, resolve it against the current directory
+    pyproject_path = os.path.abspath(pyproject_path)
+    try:
+        file_stat = os.stat(pyproject_path)
+    except OSError:
+        return MappingProxyType({})
+    file_id = (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino)
+    return read_config_file(pyproject_path, file_id)
+
+
+# Default values of the command line options, by the name of their last
+# flag. The same names are the keys that override the defaults in
+# pyproject.toml, e.g. `with-authors = true` for --with-authors.
+PARSER_DEFAULTS: Dict[str, Any] = {
+    # sys.executable, looked up by create_parser
+    "python": None,
+    "from": "mixed",
+    "order": "name",
+    "format": "plain",
+    "summary": False,
+    "output-file": None,
+    "cache-dir": None,
+    "ignore-packages": [],
+    "packages": [],
+    "with-system": False,
+    "with-authors": False,
+    "with-maintainers": False,
+    "with-urls": False,
+    "with-description": False,
+    "no-version": False,
+    "with-license-file": False,
+    "no-license-path": False,
+    "with-notice-file": False,
+    "max-license-length": 0,
+    "filter-strings": False,
+    "filter-code-page": "latin1",
+    "fail-on": None,
+    "allow-only": None,
+    "partial-match": False,
+}
+
+# Command line options as (group, flags, add_argument keywords).
+# The choices of SelectAction options are filled in by create_parser,
+# so that nothing is computed for them when the module is imported.
+PARSER_OPTIONS: Tuple[Tuple[str, Tuple[str, ...], Dict[str, Any]], ...] = (
+    (
+        "Common options",
+        ("--python",),
+        {
+            "type": str,
+            "metavar": "PYTHON_EXEC",
+            "help": "R| path to python executable to search distributions "
+            "from\n"
+            "Package will be searched in the selected python's sys.path\n"
+            "By default, will search packages for current env executable\n"
+            "(default: sys.executable)",
+        },
+    ),
+    (
+        "Common options",
+        ("--from",),
+        {
+            "dest": "from_",
+            "action": SelectAction,
+            "type": str,
+            "metavar": "SOURCE",
+            "help": "R|where to find license information\n"
+            '"meta", "classifier, "mixed", "all"\n'
+            "(default: %(default)s)",
+        },
+    ),
+    (
+        "Common options",
+        ("-o", "--order"),
+        {
+            "action": SelectAction,
+            "type": str,
+            "metavar": "COL",
+            "help": "R|order by column\n"
+            '"name", "license", "author", "url"\n'
+            "(default: %(default)s)",
+        },
+    ),
+    (
+        "Common options",
+        ("-f", "--format"),
+        {
+            "dest": "format_",
+            "action": SelectAction,
+            "type": str,
+            "metavar": "STYLE",
+            "help": "R|dump as set format style\n"
+            '"plain", "plain-vertical" "markdown", "rst", \n'
+            '"confluence", "html", "json", \n'
+            '"json-license-finder",  "csv"\n'
+            "(default: %(default)s)",
+        },
+    ),
+    (
+        "Common options",
+        ("--summary",),
+        {"action": "store_true", "help": "dump summary of each license"},
+    ),
+    (
+        "Common options",
+        ("--output-file",),
+        {"action": "store", "type": str, "help": "save license list to file"},
+    ),
+    (
+        "Common options",
+        ("--cache-dir",),
+        {
+            "action": "store",
+            "type": str,
+            "metavar": "DIR",
+            "help": "cache package information in the directory, "
+            "reused until packages are (un)installed",
+        },
+    ),
+    (
+        "Common options",
+        ("-i", "--ignore-packages"),
+        {
+            "action": "store",
+            "type": str,
+            "nargs": "+",
+            "metavar": "PKG",
+            "help": "ignore package name in dumped list",
+        },
+    ),
+    (
+        "Common options",
+        ("-p", "--packages"),
+        {
+            "action": "store",
+            "type": str,
+            "nargs": "+",
+            "metavar": "PKG",
+            "help": "only include selected packages in output",
+        },
+    ),
+    (
+        "Format options",
+        ("-s", "--with-system"),
+        {"action": "store_true", "help": "dump with system packages"},
+    ),
+    (
+        "Format options",
+        ("-a", "--with-authors"),
+        {"action": "store_true", "help": "dump with package authors"},
+    ),
+    (
+        "Format options",
+        ("--with-maintainers",),
+        {"action": "store_true", "help": "dump with package maintainers"},
+    ),
+    (
+        "Format options",
+        ("-u", "--with-urls"),
+        {"action": "store_true", "help": "dump with package urls"},
+    ),
+    (
+        "Format options",
+        ("-d", "--with-description"),
+        {
+            "action": "store_true",
+            "help": "dump with short package description",
+        },
+    ),
+    (
+        "Format options",
+        ("-nv", "--no-version"),
+        {"action": "store_true", "help": "dump without package version"},
+    ),
+    (
+        "Format options",
+        ("-l", "--with-license-file"),
+        {
+            "action": "store_true",
+            "help": "dump with location of license file and "
+            "contents, most useful with JSON output",
+        },
+    ),
+    (
+        "Format options",
+        ("--no-license-path",),
+        {
+            "action": "store_true",
+            "help": "I|when specified together with option -l, "
+            "suppress location of license file output",
+        },
+    ),
+    (
+        "Format options",
+        ("--with-notice-file",),
+        {
+            "action": "store_true",
+            "help": "I|when specified together with option -l, "
+            "dump with location of license file and contents",
+        },
+    ),
+    (
+        "Format options",
+        ("--max-license-length",),
+        {
+            "action": "store",
+            "type": int,
+            "metavar": "CHARS",
+            "help": "I|when specified together with option -l, "
+            "truncate license and notice texts longer than CHARS "
+            "characters (default: %(default)s, no limit)",
+        },
+    ),
+    (
+        "Format options",
+        ("--filter-strings",),
+        {
+            "action": "store_true",
+            "help": "filter input according to code page",
+        },
+    ),
+    (
+        "Format options",
+        ("--filter-code-page",),
+        {
+            "action": "store",
+            "type": str,
+            "metavar": "CODE",
+            "help": "I|specify code page for filtering "
+            "(default: %(default)s)",
+        },
+    ),
+    (
+        "Verify options",
+        ("--fail-on",),
+        {
+            "action": "store",
+            "type": str,
+            "help": "fail (exit with code 1) on the first occurrence "
+            "of the licenses of the semicolon-separated list",
+        },
+    ),
+    (
+        "Verify options",
+        ("--allow-only",),
+        {
+            "action": "store",
+            "type": str,
+            "help": "fail (exit with code 1) on the first occurrence "
+            "of the licenses not in the semicolon-separated list",
+        },
+    ),
+    (
+        "Verify options",
+        ("--partial-match",),
+        {
+            "action": "store_true",
+            "help": "enables partial matching for --allow-only/--fail-on",
+        },
+    ),
+)
 
 
 def create_parser(
@@ -923,203 +1559,33 @@ def create_parser(
 
     config_from_file = load_config_from_file(pyproject_path)
 
-    common_options = parser.add_argument_group("Common options")
-    format_options = parser.add_argument_group("Format options")
-    verify_options = parser.add_argument_group("Verify options")
+    option_groups = {
+        title: parser.add_argument_group(title)
+        for title in ("Common options", "Format options", "Verify options")
+    }
 
     parser.add_argument(
         "-v", "--version", action="version", version="%(prog)s " + __version__
     )
 
-    common_options.add_argument(
-        "--python",
-        type=str,
-        default=config_from_file.get("python", sys.executable),
-        metavar="PYTHON_EXEC",
-        help="R| path to python executable to search distributions from\n"
-        "Package will be searched in the selected python's sys.path\n"
-        "By default, will search packages for current env executable\n"
-        "(default: sys.executable)",
-    )
-
-    common_options.add_argument(
-        "--from",
-        dest="from_",
-        action=SelectAction,
-        type=str,
-        default=get_value_from_enum(
-            FromArg, config_from_file.get("from", "mixed")
-        ),
-        metavar="SOURCE",
-        choices=choices_from_enum(FromArg),
-        help="R|where to find license information\n"
-        '"meta", "classifier, "mixed", "all"\n'
-        "(default: %(default)s)",
-    )
-    common_options.add_argument(
-        "-o",
-        "--order",
-        action=SelectAction,
-        type=str,
-        default=get_value_from_enum(
-            OrderArg, config_from_file.get("order", "name")
-        ),
-        metavar="COL",
-        choices=choices_from_enum(OrderArg),
-        help="R|order by column\n"
-        '"name", "license", "author", "url"\n'
-        "(default: %(default)s)",
-    )
-    common_options.add_argument(
-        "-f",
-        "--format",
-        dest="format_",
-        action=SelectAction,
-        type=str,
-        default=get_value_from_enum(
-            FormatArg, config_from_file.get("format", "plain")
-        ),
-        metavar="STYLE",
-        choices=choices_from_enum(FormatArg),
-        help="R|dump as set format style\n"
-        '"plain", "plain-vertical" "markdown", "rst", \n'
-        '"confluence", "html", "json", \n'
-        '"json-license-finder",  "csv"\n'
-        "(default: %(default)s)",
-    )
-    common_options.add_argument(
-        "--summary",
-        action="store_true",
-        default=config_from_file.get("summary", False),
-        help="dump summary of each license",
-    )
-    common_options.add_argument(
-        "--output-file",
-        action="store",
-        default=config_from_file.get("output-file"),
-        type=str,
-        help="save license list to file",
-    )
-    common_options.add_argument(
-        "-i",
-        "--ignore-packages",
-        action="store",
-        type=str,
-        nargs="+",
-        metavar="PKG",
-        default=config_from_file.get("ignore-packages", []),
-        help="ignore package name in dumped list",
-    )
-    common_options.add_argument(
-        "-p",
-        "--packages",
-        action="store",
-        type=str,
-        nargs="+",
-        metavar="PKG",
-        default=config_from_file.get("packages", []),
-        help="only include selected packages in output",
-    )
-    format_options.add_argument(
-        "-s",
-        "--with-system",
-        action="store_true",
-        default=config_from_file.get("with-system", False),
-        help="dump with system packages",
-    )
-    format_options.add_argument(
-        "-a",
-        "--with-authors",
-        action="store_true",
-        default=config_from_file.get("with-authors", False),
-        help="dump with package authors",
-    )
-    format_options.add_argument(
-        "--with-maintainers",
-        action="store_true",
-        default=config_from_file.get("with-maintainers", False),
-        help="dump with package maintainers",
-    )
-    format_options.add_argument(
-        "-u",
-        "--with-urls",
-        action="store_true",
-        default=config_from_file.get("with-urls", False),
-        help="dump with package urls",
-    )
-    format_options.add_argument(
-        "-d",
-        "--with-description",
-        action="store_true",
-        default=config_from_file.get("with-description", False),
-        help="dump with short package description",
-    )
-    format_options.add_argument(
-        "-nv",
-        "--no-version",
-        action="store_true",
-        default=config_from_file.get("no-version", False),
-        help="dump without package version",
-    )
-    format_options.add_argument(
-        "-l",
-        "--with-license-file",
-        action="store_true",
-        default=config_from_file.get("with-license-file", False),
-        help="dump with location of license file and "
-        "contents, most useful with JSON output",
-    )
-    format_options.add_argument(
-        "--no-license-path",
-        action="store_true",
-        default=config_from_file.get("no-license-path", False),
-        help="I|when specified together with option -l, "
-        "suppress location of license file output",
-    )
-    format_options.add_argument(
-        "--with-notice-file",
-        action="store_true",
-        default=config_from_file.get("with-notice-file", False),
-        help="I|when specified together with option -l, "
-        "dump with location of license file and contents",
-    )
-    format_options.add_argument(
-        "--filter-strings",
-        action="store_true",
-        default=config_from_file.get("filter-strings", False),
-        help="filter input according to code page",
-    )
-    format_options.add_argument(
-        "--filter-code-page",
-        action="store",
-        type=str,
-        default=config_from_file.get("filter-code-page", "latin1"),
-        metavar="CODE",
-        help="I|specify code page for filtering " "(default: %(default)s)",
-    )
-
-    verify_options.add_argument(
-        "--fail-on",
-        action="store",
-        type=str,
-        default=config_from_file.get("fail-on", None),
-        help="fail (exit with code 1) on the first occurrence "
-        "of the licenses of the semicolon-separated list",
-    )
-    verify_options.add_argument(
-        "--allow-only",
-        action="store",
-        type=str,
-        default=config_from_file.get("allow-only", None),
-        help="fail (exit with code 1) on the first occurrence "
-        "of the licenses not in the semicolon-separated list",
-    )
-    verify_options.add_argument(
-        "--partial-match",
-        action="store_true",
-        default=config_from_file.get("partial-match", False),
-        help="enables partial matching for --allow-only/--fail-on",
-    )
+    defaults = {
+        **PARSER_DEFAULTS,
+        "python": sys.executable,
+        **config_from_file,
+    }
+
+    for group, flags, kwargs in PARSER_OPTIONS:
+        config_key = flags[-1].lstrip("-")
+        default = defaults[config_key]
+        if isinstance(default, list):
+            # argparse uses the default as is, so copy it rather than share
+            # the module level or the cached configuration list
+            default = list(default)
+        if kwargs.get("action") is SelectAction:
+            enum_cls = MAP_DEST_TO_ENUM[kwargs.get("dest", config_key)]
+            default = get_value_from_enum(enum_cls, default)
+            kwargs = {**kwargs, "choices": choices_from_enum(enum_cls)}
+        option_groups[group].add_argument(*flags, default=default, **kwargs)
 
     return parser
 
@@ -1128,10 +1594,62 @@ def output_colored(code: str, text: str, is_bold: bool = False) -> str:
     """
     Create function to output with color sequence
     """
-    if is_bold:
-        code = "1;%s" % code
+    bold = "1;" if is_bold else ""
+    return f"\033[{bold}{code}m{text}\033[0m"
 
-    return "\033[%sm%s\033[0m" % (code, text)
+
+def write_output_file(output_file: str, data: bytes) -> None:
+    """
+    Write data to output_file, replacing a regular file atomically so that
+    it is never left truncated
+
+    Files that a replacement would not preserve are written in place:
+    anything but a regular file (a symlink, a FIFO, /dev/stdout...), a
+    file with hard links or one owned by another user or group. So are
+    files in a directory where no temporary file can be created.
+    """
+    try:
+        file_stat: Optional[os.stat_result] = os.lstat(output_file)
+    except FileNotFoundError:
+        file_stat = None
+
+    is_replaceable = file_stat is None or (
+        stat.S_ISREG(file_stat.st_mode)
+        and file_stat.st_nlink == 1
+        and (
+            not hasattr(os, "geteuid")
+            or (file_stat.st_uid, file_stat.st_gid)
+            == (os.geteuid(), os.getegid())
+        )
+    )
+    if is_replaceable:
+        tmp_file = "{}.{}.tmp".format(output_file, os.urandom(8).hex())
+        try:
+            # Same permissions as a file created by open(), from the umask
+            fd = os.open(
+                tmp_file,
+                os.O_WRONLY | os.O_CREAT | os.O_EXCL | O_BINARY,
+                0o666,
+            )
+        except OSError:
+            # e.g. a writable file in a read-only directory
+            is_replaceable = False
+
+    if not is_replaceable:
+        with open(output_file, "wb") as f:
+            f.write(data)
+        return
+
+    try:
+        with open(fd, "wb") as f:
+            f.write(data)
+        if file_stat is not None:
+            os.chmod(tmp_file, stat.S_IMODE(file_stat.st_mode))
+        os.replace(tmp_file, output_file)
+    finally:
+        # Only left over when the output file could not be replaced
+        if os.path.lexists(tmp_file):
+            os.unlink(tmp_file)
 
 
 def save_if_needs(output_file: None | str, output_string: str) -> None:
@@ -1141,14 +1659,28 @@ def save_if_needs(output_file: None | str, output_string: str) -> None:
     if output_file is None:
         return
 
+    if output_string[-1:] != "\n":
+        # Always end output files with a new line
+        output_string += "\n"
+
+    # Keep the new lines as they are rather than translating them on Windows
+    data = output_string.encode("utf-8")
     try:
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(output_string)
-            if not output_string.endswith("\n"):
-                # Always end output files with a new line
-                f.write("\n")
+        # Leave an up to date file untouched
+        if os.path.getsize(output_file) == len(data):
+            with open(output_file, "rb") as f:
+                is_unchanged = f.read() == data
+        else:
+            is_unchanged = False
+    except OSError:
+        is_unchanged = False
 
-        sys.stdout.write("created path: " + output_file + "\n")
+    try:
+        if not is_unchanged:
+            write_output_file(output_file, data)
+
+        # Keep stdout for the license list itself
+        sys.stderr.write("created path: " + output_file + "\n")
         sys.exit(0)
     except IOError:
         sys.stderr.write("check path: --output-file\n")
@@ -1164,7 +1696,20 @@ def main() -> None:  # pragma: no cover
     output_file = args.output_file
     save_if_needs(output_file, output_string)
 
-    print(output_string)
+    # Write the output with a single write, encoded as the text stream
+    # would, unless stdout has been replaced by a stream without buffer
+    stdout_buffer = getattr(sys.stdout, "buffer", None)
+    if stdout_buffer is None:
+        print(output_string)
+    else:
+        sys.stdout.flush()
+        stdout_buffer.write(
+            (output_string + "\n").encode(
+                sys.stdout.encoding, sys.stdout.errors or "strict"
+            )
+        )
+        stdout_buffer.flush()
+
     warn_string = create_warn_string(args)
     if warn_string:
         print(warn_string, file=sys.stderr)
@@ -23,6 +23,7 @@ class PrettyTable:
     ) -> dict[str, str | list[str]]: ...
     def _get_rows(self, options: dict[str, str | list[str]]) -> list[str]: ...
     def add_row(self, row: list[Any]) -> None: ...
+    def add_rows(self, rows: Iterable[list[Any]]) -> None: ...
     @property
     def align(self) -> dict[str, str]: ...
     @align.setter
@@ -11,9 +11,10 @@ import tempfile
 import unittest
 import venv
 from enum import Enum, auto
+from importlib import metadata as importlib_metadata
 from importlib.metadata import Distribution
 from types import SimpleNamespace
-from typing import TYPE_CHECKING, Any, List
+from typing import TYPE_CHECKING, Any, List, cast
 from unittest.mock import MagicMock
 
 import docutils.frontend
@@ -28,20 +29,29 @@ import piplicenses
 from piplicenses import (
     DEFAULT_OUTPUT_FIELDS,
     LICENSE_UNKNOWN,
+    PARSER_DEFAULTS,
+    PARSER_OPTIONS,
+    PATTERN_LICENSE_FILE,
+    PATTERN_NOTICE_FILE,
     RULE_ALL,
     RULE_HEADER,
     RULE_NONE,
     SYSTEM_PACKAGES,
+    TRUNCATED_MARKER,
     CompatibleArgumentParser,
+    CSVPrettyTable,
     FromArg,
     __pkgname__,
     case_insensitive_partial_match_set_diff,
     case_insensitive_partial_match_set_intersect,
     case_insensitive_set_diff,
     case_insensitive_set_intersect,
+    compile_partial_match_pattern,
     create_licenses_table,
     create_output_string,
     create_parser,
+    create_string_filter,
+    create_summary_table,
     create_warn_string,
     enum_key_to_value,
     extract_homepage,
@@ -49,7 +59,11 @@ from piplicenses import (
     find_license_from_classifier,
     get_output_fields,
     get_packages,
+    get_pkg_included_file,
+    get_pkg_name,
     get_sortby,
+    get_venv_sys_path,
+    load_config_from_file,
     normalize_pkg_name,
     output_colored,
     save_if_needs,
@@ -461,6 +475,21 @@ class TestGetLicenses(CommandLineTestCase):
         # It is expected that prettytable will include
         self.assertIn(ignore_pkg_name, pkg_name_columns)
 
+    def test_ignore_packages_and_installed_version(self) -> None:
+        ignore_pkg_name = "prettytable"
+        ignore_pkg_spec = "{}:{}".format(
+            ignore_pkg_name, importlib_metadata.version(ignore_pkg_name)
+        )
+        ignore_packages_args = [
+            "--ignore-package=" + ignore_pkg_spec,
+            "--with-system",
+        ]
+        args = self.parser.parse_args(ignore_packages_args)
+        table = create_licenses_table(args)
+
+        pkg_name_columns = self._create_pkg_name_columns(table)
+        self.assertNotIn(ignore_pkg_name, pkg_name_columns)
+
     def test_with_packages(self) -> None:
         pkg_name = "py"
         only_packages_args = ["--packages=" + pkg_name]
@@ -482,6 +511,12 @@ class TestGetLicenses(CommandLineTestCase):
         pkg_name_columns = self._create_pkg_name_columns(table)
         self.assertListEqual([pkg_name], pkg_name_columns)
 
+    def test_with_packages_not_installed(self) -> None:
+        only_packages_args = ["--packages=not-installed-package"]
+        args = self.parser.parse_args(only_packages_args)
+
+        self.assertListEqual([], list(get_packages(args)))
+
     def test_with_packages_with_system(self) -> None:
         pkg_name = "prettytable"
         only_packages_args = ["--packages=" + pkg_name, "--with-system"]
@@ -629,6 +664,17 @@ class TestGetLicenses(CommandLineTestCase):
         self.assertIn('"Author":', output_string)
         self.assertNotIn('"URL":', output_string)
 
+    def test_format_json_same_as_table(self) -> None:
+        format_json_args = ["--format=json", "--order=license"]
+        args = self.parser.parse_args(format_json_args)
+        output_fields = get_output_fields(args)
+        table = create_licenses_table(args, output_fields)
+
+        self.assertEqual(
+            table.get_string(fields=output_fields, sortby=get_sortby(args)),
+            create_output_string(args),
+        )
+
     def test_format_json_license_manager(self) -> None:
         format_json_args = ["--format=json-license-finder"]
         args = self.parser.parse_args(format_json_args)
@@ -648,6 +694,15 @@ class TestGetLicenses(CommandLineTestCase):
         expected_header = '"Name","Version","License","Author"'
         self.assertEqual(obtained_header, expected_header)
 
+    def test_format_csv_escaped(self) -> None:
+        table = CSVPrettyTable(["Name", "Description"])
+        table.add_row(["foo", 'say "hello"\nworld'])
+
+        self.assertEqual(
+            '"Name","Description"\n"foo","say ""hello""\nworld"',
+            table.get_string(),
+        )
+
     def test_summary(self) -> None:
         summary_args = ["--summary"]
         args = self.parser.parse_args(summary_args)
@@ -659,6 +714,20 @@ class TestGetLicenses(CommandLineTestCase):
         warn_string = create_warn_string(args)
         self.assertTrue(len(warn_string) == 0)
 
+    def test_summary_with_given_packages(self) -> None:
+        summary_args = ["--summary"]
+        args = self.parser.parse_args(summary_args)
+        pkgs: List[dict[str, str | list[str]]] = [
+            {"license_names_str": "MIT License"},
+            {"license_names_str": "BSD License"},
+            {"license_names_str": "MIT License"},
+        ]
+        table = create_summary_table(args, pkgs)
+
+        self.assertEqual(
+            sorted(table.rows), [[1, "BSD License"], [2, "MIT License"]]
+        )
+
     def test_summary_sort_by_count(self) -> None:
         summary_args = ["--summary", "--order=count"]
         args = self.parser.parse_args(summary_args)
@@ -773,6 +842,20 @@ class TestGetLicenses(CommandLineTestCase):
         self.assertTrue({"revised BSD"} == b_intersect_c)
         self.assertTrue(len(a_intersect_empty) == 0)
 
+    def test_case_insensitive_set_ops_pre_lowered(self) -> None:
+        set_a = {"MIT License", "BSD License"}
+        set_b = {"Mit License"}
+        set_b_lower = {"mit license"}
+
+        self.assertEqual(
+            {"MIT License"},
+            case_insensitive_set_intersect(set_a, set_b, set_b_lower),
+        )
+        self.assertEqual(
+            {"BSD License"},
+            case_insensitive_set_diff(set_a, set_b, set_b_lower),
+        )
+
     def test_case_insensitive_partial_match_set_diff(self) -> None:
         set_a = {"MIT License"}
         set_b = {"Mit", "BSD License"}
@@ -787,6 +870,29 @@ class TestGetLicenses(CommandLineTestCase):
         self.assertIn("BSD License", b_diff_c)
         self.assertIn("MIT License", a_diff_empty)
 
+    def test_case_insensitive_partial_match_set_diff_multiple_matches(
+        self,
+    ) -> None:
+        set_a = {"Apache-2.0 OR BSD-2-Clause", "GPL"}
+        set_b = {"apache", "bsd"}
+        a_diff_b = case_insensitive_partial_match_set_diff(set_a, set_b)
+        a_diff_pattern = case_insensitive_partial_match_set_diff(
+            set_a, compile_partial_match_pattern(set_b)
+        )
+
+        self.assertEqual({"GPL"}, a_diff_b)
+        self.assertEqual({"GPL"}, a_diff_pattern)
+
+    def test_compile_partial_match_pattern(self) -> None:
+        pattern = compile_partial_match_pattern({"mit", "(GPL)"})
+
+        assert pattern is not None
+        self.assertTrue(pattern.search("MIT License"))
+        self.assertTrue(pattern.search("GNU General Public License (GPL)"))
+        self.assertFalse(pattern.search("GPL"))
+        self.assertIs(pattern, compile_partial_match_pattern(pattern))
+        self.assertIsNone(compile_partial_match_pattern(set()))
+
     def test_case_insensitive_partial_match_set_intersect(self) -> None:
         set_a = {"Revised BSD"}
         set_b = {"Apache License", "revised BSD"}
@@ -818,22 +924,146 @@ class MockStdStream(object):
         self.printed = p
 
 
-def test_output_file_success(monkeypatch) -> None:
-    def mocked_open(*args, **kwargs):
-        import tempfile
-
-        return tempfile.TemporaryFile("w")
-
+def test_output_file_success(monkeypatch, tmp_path) -> None:
     mocked_stdout = MockStdStream()
     mocked_stderr = MockStdStream()
-    monkeypatch.setattr(piplicenses, "open", mocked_open)
     monkeypatch.setattr(sys.stdout, "write", mocked_stdout.write)
     monkeypatch.setattr(sys.stderr, "write", mocked_stderr.write)
     monkeypatch.setattr(sys, "exit", lambda n: None)
 
-    save_if_needs("/foo/bar.txt", "license list")
-    assert "created path: " in mocked_stdout.printed
-    assert "" == mocked_stderr.printed
+    save_if_needs(str(tmp_path / "bar.txt"), "license list")
+    assert "" == mocked_stdout.printed
+    assert "created path: " in mocked_stderr.printed
+    # The temporary file has been renamed to the output file
+    assert [path.name for path in tmp_path.iterdir()] == ["bar.txt"]
+
+
+def test_output_file_unchanged(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(sys.stderr, "write", MockStdStream().write)
+    monkeypatch.setattr(sys, "exit", lambda n: None)
+    output_file = tmp_path / "licenses.txt"
+    output_file.write_bytes(b"license list\n")
+    os.utime(output_file, ns=(0, 0))
+
+    save_if_needs(str(output_file), "license list")
+    assert output_file.stat().st_mtime_ns == 0
+
+    save_if_needs(str(output_file), "other license list")
+    assert output_file.read_bytes() == b"other license list\n"
+
+
+@pytest.mark.parametrize("output_string", ["license list", "license list\n"])
+def test_output_file_content(
+    monkeypatch, tmp_path, output_string: str
+) -> None:
+    monkeypatch.setattr(sys.stderr, "write", MockStdStream().write)
+    monkeypatch.setattr(sys, "exit", lambda n: None)
+    output_file = tmp_path / "licenses.txt"
+
+    save_if_needs(str(output_file), output_string)
+    assert output_file.read_bytes() == b"license list\n"
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "symlink") or sys.platform == "win32",
+    reason="symlinks may require privileges",
+)
+def test_output_file_symlink(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(sys.stderr, "write", MockStdStream().write)
+    monkeypatch.setattr(sys, "exit", lambda n: None)
+    target_file = tmp_path / "target.txt"
+    target_file.write_bytes(b"old license list\n")
+    output_file = tmp_path / "licenses.txt"
+    output_file.symlink_to(target_file)
+
+    save_if_needs(str(output_file), "license list")
+    # Written through the symlink rather than replacing it
+    assert output_file.is_symlink()
+    assert target_file.read_bytes() == b"license list\n"
+
+
+def test_output_file_keeps_existing_tmp_file(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(sys.stderr, "write", MockStdStream().write)
+    monkeypatch.setattr(sys, "exit", lambda n: None)
+    output_file = tmp_path / "licenses.txt"
+    output_file.write_bytes(b"old license list\n")
+    output_file.chmod(0o640)
+    tmp_file = tmp_path / "licenses.txt.tmp"
+    tmp_file.write_bytes(b"user data\n")
+
+    save_if_needs(str(output_file), "license list")
+    assert output_file.read_bytes() == b"license list\n"
+    assert tmp_file.read_bytes() == b"user data\n"
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "licenses.txt",
+        "licenses.txt.tmp",
+    ]
+    if sys.platform != "win32":
+        assert output_file.stat().st_mode & 0o777 == 0o640
+
+
+def test_output_file_in_read_only_directory(monkeypatch, tmp_path) -> None:
+    def mocked_os_open(*args, **kwargs):
+        # As in a directory without write permission, even for root
+        raise PermissionError
+
+    mocked_stderr = MockStdStream()
+    monkeypatch.setattr(sys.stderr, "write", mocked_stderr.write)
+    monkeypatch.setattr(sys, "exit", lambda n: None)
+    output_file = tmp_path / "licenses.txt"
+    output_file.write_bytes(b"old license list\n")
+
+    monkeypatch.setattr(piplicenses.os, "open", mocked_os_open)
+    save_if_needs(str(output_file), "license list")
+    monkeypatch.undo()
+
+    # Written in place instead
+    assert "created path: " in mocked_stderr.printed
+    assert output_file.read_bytes() == b"license list\n"
+
+
+def test_output_file_hard_link(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(sys.stderr, "write", MockStdStream().write)
+    monkeypatch.setattr(sys, "exit", lambda n: None)
+    output_file = tmp_path / "licenses.txt"
+    output_file.write_bytes(b"old license list\n")
+    linked_file = tmp_path / "linked.txt"
+    os.link(output_file, linked_file)
+
+    save_if_needs(str(output_file), "license list")
+    assert linked_file.read_bytes() == b"license list\n"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX permissions")
+def test_output_file_new_file_mode(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(sys.stderr, "write", MockStdStream().write)
+    monkeypatch.setattr(sys, "exit", lambda n: None)
+    output_file = tmp_path / "licenses.txt"
+
+    umask = os.umask(0o027)
+    try:
+        save_if_needs(str(output_file), "license list")
+    finally:
+        os.umask(umask)
+    assert output_file.stat().st_mode & 0o777 == 0o640
+
+
+def test_output_file_replace_error(monkeypatch, tmp_path) -> None:
+    def mocked_replace(*args, **kwargs):
+        raise OSError
+
+    mocked_stderr = MockStdStream()
+    monkeypatch.setattr(sys.stderr, "write", mocked_stderr.write)
+    monkeypatch.setattr(sys, "exit", lambda n: None)
+    monkeypatch.setattr(piplicenses.os, "replace", mocked_replace)
+    output_file = tmp_path / "licenses.txt"
+    output_file.write_bytes(b"old license list\n")
+
+    save_if_needs(str(output_file), "license list")
+    assert "check path: " in mocked_stderr.printed
+    # The original file is intact and no temporary file is left behind
+    assert output_file.read_bytes() == b"old license list\n"
+    assert [path.name for path in tmp_path.iterdir()] == ["licenses.txt"]
 
 
 def test_output_file_error(monkeypatch) -> None:
@@ -852,6 +1082,22 @@ def test_output_file_error(monkeypatch) -> None:
     assert "check path: " in mocked_stderr.printed
 
 
+def test_warn_string_without_reading_packages(monkeypatch) -> None:
+    def distributions_not_expected(*args, **kwargs):
+        raise AssertionError("packages must not be read")
+
+    monkeypatch.setattr(
+        piplicenses.importlib_metadata,
+        "distributions",
+        distributions_not_expected,
+    )
+    parser = create_parser()
+    args = parser.parse_args(["--summary", "--with-license-file"])
+
+    # Warnings only depend on the arguments, main() reads packages once
+    assert "best paired with --format=json" in create_warn_string(args)
+
+
 def test_output_file_none(monkeypatch) -> None:
     mocked_stdout = MockStdStream()
     mocked_stderr = MockStdStream()
@@ -864,6 +1110,75 @@ def test_output_file_none(monkeypatch) -> None:
     assert "" == mocked_stderr.printed
 
 
+@pytest.mark.parametrize(
+    "metadata_dir_name",
+    [
+        "foo_bar-1.0.dist-info",
+        "foo_bar-1.0-py3.11.egg-info",
+        "foo_bar.egg-info",
+    ],
+)
+def test_get_pkg_name(tmp_path, metadata_dir_name: str) -> None:
+    metadata_dir = tmp_path / metadata_dir_name
+    metadata_dir.mkdir()
+    pkg = Distribution.at(metadata_dir)
+
+    # No METADATA file, the name can only come from the directory name
+    assert get_pkg_name(pkg) == "foo_bar"
+
+
+def test_get_pkg_included_file_without_record(tmp_path) -> None:
+    dist_info = tmp_path / "foo-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text("Name: foo\nVersion: 1.0\n")
+    (dist_info / "LICENSE.txt").write_text("license text")
+    pkg = Distribution.at(dist_info)
+
+    assert pkg.files is None
+    assert get_pkg_included_file(pkg, PATTERN_LICENSE_FILE) == (
+        str(dist_info / "LICENSE.txt"),
+        "license text",
+    )
+    assert get_pkg_included_file(pkg, PATTERN_NOTICE_FILE) == (
+        LICENSE_UNKNOWN,
+        LICENSE_UNKNOWN,
+    )
+
+
+def test_get_pkg_included_file_truncated(tmp_path) -> None:
+    dist_info = tmp_path / "foo-1.0.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text("Name: foo\nVersion: 1.0\n")
+    (dist_info / "LICENSE").write_text("license text")
+    pkg = Distribution.at(dist_info)
+
+    _, license_text = get_pkg_included_file(
+        pkg, PATTERN_LICENSE_FILE, max_length=7
+    )
+    assert license_text == "license" + TRUNCATED_MARKER
+
+    _, license_text = get_pkg_included_file(
+        pkg, PATTERN_LICENSE_FILE, max_length=12
+    )
+    assert license_text == "license text"
+
+    # Not truncated by default
+    _, license_text = get_pkg_included_file(pkg, PATTERN_LICENSE_FILE)
+    assert license_text == "license text"
+
+
+def test_max_license_length(parser: CompatibleArgumentParser) -> None:
+    args = parser.parse_args(
+        ["--with-license-file", "--max-license-length=1", "-p", "pytest"]
+    )
+    pkg_infos = list(get_packages(args))
+
+    assert pkg_infos
+    assert pkg_infos[0]["licensetext"] == (
+        cast(str, pkg_infos[0]["licensetext"])[:1] + TRUNCATED_MARKER
+    )
+
+
 def test_allow_only(monkeypatch) -> None:
     licenses = (
         "Bsd License",
@@ -920,6 +1235,70 @@ def test_allow_only_partial(monkeypatch) -> None:
     )
 
 
+def test_cache_dir(monkeypatch, tmp_path) -> None:
+    class DistributionsRead(Exception):
+        pass
+
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    # Unrelated files in the cache directory are left alone
+    (cache_dir / "other.json").write_text("{}")
+    args = create_parser().parse_args(
+        ["--packages=pytest", "--cache-dir={}".format(cache_dir)]
+    )
+    packages = list(get_packages(args))
+    assert [p["name"] for p in packages] == ["pytest"]
+    cache_files = sorted(cache_dir.iterdir())
+    assert len(cache_files) == 2
+
+    def distributions_not_expected(*args: Any, **kwargs: Any) -> None:
+        raise DistributionsRead
+
+    monkeypatch.setattr(
+        piplicenses.importlib_metadata,
+        "distributions",
+        distributions_not_expected,
+    )
+    assert list(get_packages(args)) == packages
+
+    # Options changing the package information don't reuse the cache
+    args = create_parser().parse_args(
+        ["--packages=py", "--cache-dir={}".format(cache_dir)]
+    )
+    with pytest.raises(DistributionsRead):
+        list(get_packages(args))
+
+    # Entries for other options are kept, and all of them are reused
+    monkeypatch.undo()
+    list(get_packages(args))
+    assert len(list(cache_dir.iterdir())) == 3
+    monkeypatch.setattr(
+        piplicenses.importlib_metadata,
+        "distributions",
+        distributions_not_expected,
+    )
+    for packages_arg in ("--packages=pytest", "--packages=py"):
+        args = create_parser().parse_args(
+            [packages_arg, "--cache-dir={}".format(cache_dir)]
+        )
+        list(get_packages(args))
+
+    # Beyond the limit, the least recently used entries are removed
+    monkeypatch.undo()
+    monkeypatch.setattr(piplicenses, "MAX_CACHE_FILES", 1)
+    for cache_file in cache_dir.iterdir():
+        os.utime(cache_file, ns=(0, 0))
+    args = create_parser().parse_args(
+        ["--packages=pytest", "--with-system", f"--cache-dir={cache_dir}"]
+    )
+    list(get_packages(args))
+    new_cache_files = sorted(cache_dir.iterdir())
+    assert cache_dir / "other.json" in new_cache_files
+    new_entries = [p for p in new_cache_files if p.name != "other.json"]
+    assert len(new_entries) == 1
+    assert new_entries[0] not in cache_files
+
+
 def test_different_python() -> None:
     import tempfile
 
@@ -943,6 +1322,43 @@ def test_different_python() -> None:
     assert package_names == expected_packages
 
 
+def test_venv_sys_path(tmp_path) -> None:
+    if os.name == "nt":
+        executable = tmp_path / "Scripts" / "python.exe"
+        site_packages = tmp_path / "Lib" / "site-packages"
+    else:
+        executable = tmp_path / "bin" / "python"
+        site_packages = tmp_path / "lib" / "python3.11" / "site-packages"
+    executable.parent.mkdir(parents=True)
+    executable.touch()
+    site_packages.mkdir(parents=True)
+    (tmp_path / "src").mkdir()
+    (site_packages / "editable.pth").write_text(
+        "# comment\nimport os\n../../../src\n../../../missing\n"
+    )
+    pyvenv_cfg = tmp_path / "pyvenv.cfg"
+    pyvenv_cfg.write_text(
+        "home = /usr/bin\n"
+        "include-system-site-packages = false\n"
+        "version = 3.11.7\n"
+    )
+
+    assert get_venv_sys_path(str(executable)) == [
+        str(site_packages),
+        str(site_packages / "../../../src"),
+    ]
+
+    pyvenv_cfg.write_text(
+        "home = /usr/bin\n"
+        "include-system-site-packages = true\n"
+        "version = 3.11.7\n"
+    )
+    assert get_venv_sys_path(str(executable)) is None
+
+    pyvenv_cfg.unlink()
+    assert get_venv_sys_path(str(executable)) is None
+
+
 def test_fail_on(monkeypatch) -> None:
     licenses = ("MIT license",)
     allow_only_args = ["--fail-on={}".format(";".join(licenses))]
@@ -1022,6 +1438,17 @@ def test_verify_args(
     for arg in ("--with-notice-file", "--with-license-file"):
         assert arg in capture
 
+    with pytest.raises(SystemExit):
+        parser.parse_args(["--max-license-length=10"])
+    capture = capsys.readouterr().err
+    for arg in ("--max-license-length", "--with-license-file"):
+        assert arg in capture
+
+    with pytest.raises(SystemExit):
+        parser.parse_args(["-l", "--max-license-length=-1"])
+    capture = capsys.readouterr().err
+    assert "--max-license-length" in capture
+
     # --filter-strings missing
     with pytest.raises(SystemExit):
         parser.parse_args(["--filter-code-page=utf8"])
@@ -1037,6 +1464,14 @@ def test_verify_args(
         assert arg in capture
 
 
+@pytest.mark.parametrize("code_page", ["latin1", "latin-1", "ascii", "cp1252"])
+def test_create_string_filter(code_page: str) -> None:
+    text = "Caf\u00e9 \u20ac " + UNICODE_APPENDIX
+    expected = text.encode(code_page, errors="ignore").decode(code_page)
+
+    assert create_string_filter(code_page)(text) == expected
+
+
 def test_normalize_pkg_name() -> None:
     expected_normalized_name = "pip-licenses"
 
@@ -1066,7 +1501,7 @@ def test_extract_homepage_project_url_fallback() -> None:
 
     assert "homepage" == extract_homepage(metadata=metadata)
 
-    metadata.get_all.assert_called_once_with("Project-URL", [])
+    metadata.get_all.assert_called_once_with("Project-URL")
 
 
 def test_extract_homepage_project_url_fallback_multiple_parts() -> None:
@@ -1083,7 +1518,54 @@ def test_extract_homepage_project_url_fallback_multiple_parts() -> None:
         metadata=metadata
     )
 
-    metadata.get_all.assert_called_once_with("Project-URL", [])
+    metadata.get_all.assert_called_once_with("Project-URL")
+
+
+def test_extract_homepage_project_url_fallback_unknown_keys() -> None:
+    metadata = MagicMock()
+    metadata.get.return_value = None
+
+    # Keys without priority are never used
+    metadata.get_all.return_value = [
+        "Documentation, documentation",
+        "Bug Tracker, bug tracker",
+        "Funding, funding",
+    ]
+
+    assert "bug tracker" == extract_homepage(metadata=metadata)
+
+    metadata.get_all.assert_called_once_with("Project-URL")
+
+
+def test_extract_homepage_project_url_fallback_first_wins() -> None:
+    metadata = MagicMock()
+    metadata.get.return_value = None
+
+    metadata.get_all.return_value = [
+        "Source, source",
+        "Source, other source",
+        "Homepage, homepage",
+        "Homepage, other homepage",
+    ]
+
+    assert "homepage" == extract_homepage(metadata=metadata)
+
+    metadata.get_all.return_value = [
+        "Changelog, changelog",
+        "Source, source",
+        "Source, other source",
+    ]
+
+    assert "source" == extract_homepage(metadata=metadata)
+
+
+def test_extract_homepage_project_url_missing() -> None:
+    metadata = MagicMock()
+
+    metadata.get.return_value = None
+    metadata.get_all.return_value = None
+
+    assert None is extract_homepage(metadata=metadata)
 
 
 def test_extract_homepage_empty() -> None:
@@ -1095,7 +1577,7 @@ def test_extract_homepage_empty() -> None:
     assert None is extract_homepage(metadata=metadata)
 
     metadata.get.assert_called_once_with("home-page", None)
-    metadata.get_all.assert_called_once_with("Project-URL", [])
+    metadata.get_all.assert_called_once_with("Project-URL")
 
 
 def test_extract_homepage_project_uprl_fallback_capitalisation() -> None:
@@ -1110,7 +1592,7 @@ def test_extract_homepage_project_uprl_fallback_capitalisation() -> None:
 
     assert "homepage" == extract_homepage(metadata=metadata)
 
-    metadata.get_all.assert_called_once_with("Project-URL", [])
+    metadata.get_all.assert_called_once_with("Project-URL")
 
 
 def test_pyproject_toml_args_parsed_correctly():
@@ -1161,3 +1643,65 @@ def test_pyproject_toml_args_parsed_correctly():
     assert args.fail_on == tool_conf["fail-on"]
 
     os.unlink(temp_file.name)
+
+
+def test_load_config_from_file_reloads_modified_file(tmp_path) -> None:
+    pyproject_path = tmp_path / "pyproject.toml"
+    pyproject_path.write_text(
+        tomli_w.dumps({"tool": {__pkgname__: {"summary": True}}})
+    )
+
+    config = load_config_from_file(str(pyproject_path))
+    assert config["summary"] is True
+    assert load_config_from_file(str(pyproject_path)) is config
+
+    pyproject_path.write_text(
+        tomli_w.dumps({"tool": {__pkgname__: {"summary": False}}})
+    )
+    stat = pyproject_path.stat()
+    os.utime(pyproject_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    assert load_config_from_file(str(pyproject_path))["summary"] is False
+    assert load_config_from_file(str(tmp_path / "missing.toml")) == {}
+
+
+def test_parser_defaults_match_options() -> None:
+    config_keys = {flags[-1].lstrip("-") for _, flags, _ in PARSER_OPTIONS}
+    assert config_keys == set(PARSER_DEFAULTS)
+
+
+def test_load_config_from_file_per_directory(monkeypatch, tmp_path) -> None:
+    configs: dict[str, dict[str, Any]] = {
+        "a": {"summary": True},
+        "b": {"format": "json"},
+    }
+    for name, config in configs.items():
+        (tmp_path / name).mkdir()
+        pyproject_path = tmp_path / name / "pyproject.toml"
+        pyproject_path.write_text(
+            tomli_w.dumps({"tool": {__pkgname__: config}})
+        )
+        # Same timestamp, as after a checkout or extracting an archive
+        os.utime(pyproject_path, ns=(0, 0))
+
+    for name, config in configs.items():
+        monkeypatch.chdir(tmp_path / name)
+        assert load_config_from_file("pyproject.toml") == config
+def test_parser_defaults_not_shared(monkeypatch, tmp_path) -> None:
+    args = create_parser().parse_args([])
+    args.ignore_packages.append("pytest")
+    assert create_parser().parse_args([]).ignore_packages == []
+
+    # Nor with the cached configuration
+    pyproject_path = tmp_path / "pyproject.toml"
+    pyproject_path.write_text(
+        tomli_w.dumps({"tool": {__pkgname__: {"packages": ["pytest"]}}})
+    )
+    args = create_parser(str(pyproject_path)).parse_args([])
+    args.packages.append("py")
+    args = create_parser(str(pyproject_path)).parse_args([])
+    assert args.packages == ["pytest"]
+
+    # Looked up when the parser is created, not when the module is imported
+    monkeypatch.setattr(sys, "executable", "/path/to/python")
+    assert create_parser().parse_args([]).python == "/path/to/python"